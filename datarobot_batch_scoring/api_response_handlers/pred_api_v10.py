@@ -1,7 +1,6 @@
 import operator
 from itertools import chain
 import json
-from six.moves import zip
 
 from datarobot_batch_scoring.exceptions import UnexpectedKeptColumnCount, \
     NoPredictionThresholdInResult
@@ -1,19 +1,17 @@
 # -*- coding: utf-8 -*-
-from __future__ import print_function
-
 import csv
 import multiprocessing
 import os
 import platform
+import queue
 import signal
 import sys
 import threading
+from contextlib import ExitStack
 from multiprocessing.managers import SyncManager
 from time import time
 
 import requests
-import six
-from six.moves import queue
 
 from datarobot_batch_scoring import __version__
 from datarobot_batch_scoring.api_response_handlers import \
@@ -33,11 +31,6 @@ from datarobot_batch_scoring.utils import (acquire_api_token,
 from datarobot_batch_scoring.writer import (WriterProcess, RunContext,
                                             decode_writer_state)
 
-if six.PY2:  # pragma: no cover
-    from contextlib2 import ExitStack
-elif six.PY3:  # pragma: no cover
-    from contextlib import ExitStack
-
 
 MAX_BATCH_SIZE = 5 * 1024 ** 2
 
@@ -159,7 +152,7 @@ def run_batch_predictions(base_url, base_headers, user, pwd,
             output_delimiter=output_delimiter)
         if auto_sample:
             #  override n_sample
-            n_samples = auto_sampler(dataset, encoding, ui)
+            n_samples = auto_sampler(dataset, encoding, ui, fast=fast_mode)
             ui.info('auto_sample: will use batches of {} rows'
                     ''.format(n_samples))
         # Make a sync request to check authentication and fail early
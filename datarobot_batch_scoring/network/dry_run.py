@@ -1,11 +1,11 @@
 import collections
 import logging
+import queue
 import signal
 
 from concurrent.futures import FIRST_COMPLETED
 from concurrent.futures import wait
 from datarobot_batch_scoring.consts import (SENTINEL)
-from six.moves import queue
 
 from .base_network_worker import BaseNetworkWorker
 
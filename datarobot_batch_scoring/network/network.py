@@ -2,21 +2,17 @@ import collections
 import json
 import logging
 import multiprocessing
+import queue
 import signal
 from functools import partial
 
 from time import time
 from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import wait
 
 from requests.utils import get_environ_proxies
 
-try:
-    from futures import ThreadPoolExecutor
-except ImportError:
-    from concurrent.futures import ThreadPoolExecutor
-
-from six.moves import queue
 import requests
 import requests.adapters
 
@@ -2,16 +2,35 @@ import codecs
 import csv
 import gzip
 import io
+import mmap
 import multiprocessing
 import os
 import signal
-import sys
-from itertools import chain
+from array import array
+from contextlib import closing
+from itertools import accumulate, chain, islice, repeat
+from operator import add
+from queue import Full
 from time import time
 
-import six
-from six.moves.queue import Full
-import chardet
+try:
+    #  rapidgzip decompresses gzip files with a pool of threads.
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
+
+try:
+    #  cchardet is a C implementation of chardet's API and is several
+    #  orders of magnitude faster, so prefer it when it is installed.
+    import cchardet as chardet
+except ImportError:
+    import chardet
+
+try:
+    #  numpy finds the line breaks of a buffer in one vectorized scan.
+    import numpy
+except ImportError:
+    numpy = None
 
 from datarobot_batch_scoring.consts import (Batch,
                                             REPORT_INTERVAL,
@@ -20,16 +39,28 @@ from datarobot_batch_scoring.detect import Detector
 from datarobot_batch_scoring.utils import get_rusage, SerializableDialect
 
 
-if six.PY2:
-    import StringIO
-
-
 DETECT_SAMPLE_SIZE_FAST = int(0.2 * 1024 ** 2)
-DETECT_SAMPLE_SIZE_SLOW = 1024 ** 2
+DETECT_SAMPLE_SIZE_SLOW = int(0.25 * 1024 ** 2)
 AUTO_SAMPLE_SIZE = int(0.5 * 1024 ** 2)
 AUTO_SMALL_SAMPLES = 500
 AUTO_SAMPLE_FALLBACK = 10
 AUTO_GOAL_SIZE = int(2.5 * 1024 ** 2)  # size we want per batch
+INPUT_BUFFER_SIZE = 1024 ** 2
+FAST_RANGE_SIZE = 8 * 1024 ** 2  # bytes of a fast mode byte range
+
+
+#  delimiters counted by `guess_delimiter` before falling back to csv.Sniffer
+DELIMITER_CANDIDATES = (',', ';', '\t', '|')
+
+#  Ordered so that the UTF-32 marks are checked before the UTF-16 ones
+#  they start with.
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
 
 
 def decode_reader_state(ch):
@@ -44,61 +75,184 @@ def decode_reader_state(ch):
     }.get(ch)
 
 
+def open_binary(filename, parallel=False):
+    """Open `filename` for buffered binary reading.
+
+    Gzipped files (extension '.gz') are decompressed on the fly, in
+    parallel if `parallel` is set and rapidgzip is installed. Starting its
+    threads only pays off when the whole file is read, not for samples.
+    Reads are buffered in blocks of ``INPUT_BUFFER_SIZE`` so that inflate
+    is called on large blocks instead of once per line.
+    """
+    if filename.endswith('.gz'):
+        if parallel and rapidgzip is not None:
+            raw = rapidgzip.RapidgzipFile(
+                filename, parallelization=multiprocessing.cpu_count())
+        else:
+            raw = gzip.open(filename, 'rb')
+        return io.BufferedReader(raw, buffer_size=INPUT_BUFFER_SIZE)
+    return open(filename, 'rb', buffering=INPUT_BUFFER_SIZE)
+
+
+class FastChunk(object):
+    """The raw lines of a fast mode batch.
+
+    Instead of one string object per line the lines are kept in a single
+    UTF-8 encoded buffer ``data`` together with an array ``offsets`` of
+    line boundaries: line ``i`` spans ``offsets[i]`` to ``offsets[i + 1]``.
+    Offsets are relative to ``offsets[0]``, which makes slicing a chunk
+    a matter of slicing both.
+
+    Indexing or iterating a chunk yields the lines as text, so it can be
+    used wherever a list of lines is expected.
+
+    ``data`` is an immutable ``bytes`` object so that putting a chunk on
+    a multiprocessing queue pickles two flat buffers instead of one
+    object per line.
+    """
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_lines(cls, lines):
+        lines = [line.encode('utf-8') for line in lines]
+        offsets = array('i', [0])
+        offsets.extend(accumulate(map(len, lines)))
+        return cls(b''.join(lines), offsets)
+
+    @classmethod
+    def from_buffer(cls, data):
+        """Build a chunk from the UTF-8 encoded, LF separated lines in `data`.
+        """
+        return cls(data, line_offsets(data))
+
+    @classmethod
+    def concat(cls, chunks):
+        """Join the list of chunks `chunks`, copying their data once. """
+        offsets = array('i', [0])
+        shift = 0
+        for chunk in chunks:
+            offsets.extend(map(add, islice(chunk.offsets, 1, None),
+                               repeat(shift - chunk.offsets[0])))
+            shift += len(chunk.data)
+        return cls(b''.join(chunk.data for chunk in chunks), offsets)
+
+    def __reduce__(self):
+        return FastChunk, (self.data, self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _line(self, start, end):
+        base = self.offsets[0]
+        line = self.data[start - base:end - base]
+        return line.decode('utf-8')
+
+    def __getitem__(self, index):
+        offsets = self.offsets
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('FastChunk does not support extended '
+                                 'slicing')
+            stop = max(start, stop)
+            base = offsets[0]
+            return FastChunk(
+                self.data[offsets[start] - base:offsets[stop] - base],
+                offsets[start:stop + 1])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('FastChunk index out of range')
+        return self._line(offsets[index], offsets[index + 1])
+
+    def __iter__(self):
+        offsets = self.offsets
+        for start, end in zip(offsets, islice(offsets, 1, None)):
+            yield self._line(start, end)
+
+    def __repr__(self):
+        return '<FastChunk rows={} bytes={}>'.format(len(self),
+                                                     len(self.data))
+
+
+def line_offsets(data):
+    """Return the offsets of the LF separated lines in the bytes `data`.
+
+    The result starts with 0 and ends with ``len(data)``. With numpy the
+    line breaks are found without creating an object per line.
+    """
+    if numpy is None:
+        offsets = array('i', [0])
+        offsets.extend(accumulate(map(len, data.splitlines(True))))
+        return offsets
+    breaks = numpy.flatnonzero(numpy.frombuffer(data, dtype=numpy.uint8) ==
+                               0x0A)
+    offsets = array('i', [0])
+    offsets.frombytes((breaks + 1).astype(numpy.intc).tobytes())
+    if data and not data.endswith(b'\n'):
+        offsets.append(len(data))
+    return offsets
+
+
+#  encoded header lines by fieldnames, see `encode_header`
+_encoded_headers = {}
+
+
+def encode_header(header):
+    """Return the UTF-8 encoded header line for the fieldnames `header`.
+
+    The header is the same for every batch of a dataset, so it is only
+    joined and encoded the first time.
+    """
+    key = tuple(header)
+    try:
+        return _encoded_headers[key]
+    except KeyError:
+        line = (','.join(header) + '\n').encode('utf-8')
+        _encoded_headers[key] = line
+        return line
+
+
 def fast_to_csv_chunk(data, header):
     """Fast routine to format data for prediction api.
 
-    Returns data in unicode.
+    `data` is a ``FastChunk``, its buffer is sent as it is.
+    Returns data encoded in UTF-8.
     """
-    header = ','.join(header)
-    chunk = ''.join(chain((header, os.linesep), data))
-    if six.PY3:
-        return chunk.encode('utf-8')
-    else:
-        return chunk
+    return encode_header(header) + data.data
 
 
 def slow_to_csv_chunk(data, header):
     """Slow routine to format data for prediction api.
     Returns data in unicode.
     """
-    if six.PY3:
-        buf = io.StringIO()
-    else:
-        buf = io.BytesIO()
-
+    buf = io.StringIO()
     writer = csv.writer(buf)
     writer.writerow(header)
     writer.writerows(data)
-    if six.PY3:
-        return buf.getvalue().encode('utf-8')
-    else:
-        return buf.getvalue()
+    return buf.getvalue().encode('utf-8')
 
 
-class Recoder:
-    """
-    Iterator that reads an encoded stream and decodes the input to UTF-8
-    for Python 2. In Python 3 the open function decodes the file.
-    """
-    def __init__(self, f, encoding):
-        f.seek(0)
-        if six.PY3:
-            self.reader = f
-        if six.PY2:
-            self.reader = codecs.StreamRecoder(f,
-                                               codecs.getencoder('utf-8'),
-                                               codecs.getdecoder('utf-8'),
-                                               codecs.getreader(encoding),
-                                               codecs.getwriter(encoding))
+def detect_encoding(sample):
+    """Detect the encoding of the bytes in `sample`.
 
-    def __iter__(self):
-        return self
-
-    def next(self):   # python 3
-        return self.reader.next()
-
-    def __next__(self):  # python 2
-        return self.reader.__next__()
+    Samples starting with a byte order mark or made of ASCII only are
+    decided without running the (much more expensive) chardet detector.
+    """
+    for bom, encoding in BOM_ENCODINGS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        sample.decode('ascii')
+    except UnicodeDecodeError:
+        pass
+    else:
+        return 'ascii'
+    return chardet.detect(sample)['encoding'].lower()
 
 
 class CSVReader(object):
@@ -109,39 +263,53 @@ class CSVReader(object):
         self.encoding = encoding
         self._ui = ui
 
-    def _create_reader(self):
-        fd = Recoder(self.fd, self.encoding)
-        return csv.reader(fd, self.dialect, delimiter=self.dialect.delimiter)
+    def _create_reader(self, lines=None):
+        if lines is None:
+            self.fd.seek(0)
+            lines = self.fd
+        return csv.reader(lines, self.dialect,
+                          delimiter=self.dialect.delimiter)
 
 
 class FastReader(CSVReader):
-    """A reader that only reads the file in text mode but not parses it. """
+    """A reader that only reads the file in text mode but not parses it.
 
-    def __init__(self, fd, encoding, ui):
+    The first lines are read once: they are parsed to get the header and
+    to check that the input has no multiline records, then handed out
+    again by ``__iter__`` ahead of the rest of the file.
+    """
+
+    def __init__(self, fd, encoding, ui, peek_size=100):
         super(FastReader, self).__init__(fd, encoding, ui)
-        self._check_for_multiline_input()
-        reader = self._create_reader()
+        self._lines = iter(self.fd)
+        # one line more than `peek_size`, so that a record starting on the
+        # last checked line is seen to continue rather than closed at the
+        # end of the peek
+        self._peeked = list(islice(self._lines, peek_size + 1))
+        reader = csv.reader(self._peeked, self.dialect,
+                            delimiter=self.dialect.delimiter)
         self.header = next(reader)
         self.fieldnames = [c.strip() for c in self.header]
+        self._check_for_multiline_input(reader)
 
     def __iter__(self):
-        fd = Recoder(self.fd, self.encoding)
-        it = iter(fd)
-        next(it)  # skip header
-        return it
-
-    def _check_for_multiline_input(self, peek_size=100):
-        # peek the first `peek_size` records for multiline CSV
-        reader = self._create_reader()
-        i = 0
-        for line in reader:
-            i += 1
-            if i == peek_size:
-                break
-
-        peek_size = min(i, peek_size)
-
-        if reader.line_num != peek_size:
+        return chain(islice(self._peeked, 1, None), self._lines)
+
+    def _check_for_multiline_input(self, reader):
+        # every peeked line has to be a record of its own. A record can
+        # only continue on the next line after a quote or escape character,
+        # so without those (and NUL or fields too long, which the csv
+        # module rejects) the lines don't need to be parsed.
+        lines = self._peeked[1:]
+        text = ''.join(lines)
+        special = [c for c in (self.dialect.quotechar,
+                               self.dialect.escapechar, '\r', '\0') if c]
+        if (reader.line_num == 1 and
+                not any(c in text for c in special) and
+                max(map(len, lines), default=0) <= csv.field_size_limit()):
+            return
+        n_records = 1 + sum(1 for _ in reader)
+        if reader.line_num != n_records:
             self._ui.fatal('Detected multiline CSV format'
                            ' -- dont use flag `--fast` '
                            'to force CSV parsing. '
@@ -159,34 +327,206 @@ class SlowReader(CSVReader):
         self.fieldnames = [c.strip() for c in self.header]
 
     def __iter__(self):
-        self.reader = self._create_reader()
+        return chain.from_iterable(self.iter_chunks(1000))
+
+    def iter_chunks(self, chunk_size):
+        """Yield lists of `chunk_size` non-empty rows.
+
+        The lines of a chunk are split by `build_row_parser` when they
+        can be, otherwise rows are pulled from a csv reader that may read
+        on past the chunk's lines for multiline records. Empty rows are
+        rare, so instead of checking every row each chunk is searched for
+        them once and only rebuilt and topped up if it has any.
+        """
+        self.fd.seek(0)
+        lines = iter(self.fd)
+        next(self._create_reader(lines))  # skip header
+        parse = build_row_parser(self.dialect)
         warned = False
-        for i, row in enumerate(self.reader):
-            if i == 0:
-                # skip header
-                continue
-
-            if len(row) == 0:
+        chunk = []
+        while True:
+            n_rows = chunk_size - len(chunk)
+            block = list(islice(lines, n_rows))
+            rows = parse(block) if parse and block else None
+            if rows is None:
+                reader = self._create_reader(chain(block, lines))
+                rows = list(islice(reader, n_rows))
+            chunk.extend(rows)
+            exhausted = len(chunk) < chunk_size
+            if [] in chunk:
                 if not warned:
                     self._ui.warning('Detected empty rows in the CSV file. '
                                      'These rows will be discarded.')
                     warned = True
-                continue
+                chunk = [row for row in chunk if row]
+                if not exhausted:
+                    continue
+            if chunk:
+                yield chunk
+            if exhausted:
+                return
+            chunk = []
+
 
-            yield row
+def build_row_parser(dialect):
+    """Return a function that splits a list of complete lines into the
+    rows of `dialect` with ``str.split``, or None if the dialect converts
+    or strips fields.
+
+    The function returns None for lines that need the csv module: lines
+    with quote or escape characters, carriage returns, NUL, or fields that
+    could exceed ``csv.field_size_limit``. Empty lines become empty rows,
+    as with ``csv.reader``.
+    """
+    if dialect.quoting == csv.QUOTE_NONNUMERIC or dialect.skipinitialspace:
+        return None
+    delimiter = dialect.delimiter
+    #  csv.reader rejects NUL before Python 3.11, leave that to it
+    special = [c for c in (dialect.quotechar, dialect.escapechar,
+                           '\r', '\0') if c]
+
+    def parse(lines):
+        text = ''.join(lines)
+        if (any(c in text for c in special) or
+                max(map(len, lines)) > csv.field_size_limit()):
+            return None
+        if text.endswith('\n'):
+            text = text[:-1]
+        rows = list(map(str.split, text.split('\n'), repeat(delimiter)))
+        if [''] in rows:
+            rows = [row if row != [''] else [] for row in rows]
+        return rows
+    return parse
 
 
 def iter_chunks(csvfile, chunk_size):
-    chunk = []
-    for row in csvfile:
-        chunk.append(row)
-        if len(chunk) >= chunk_size:
-            yield chunk
-            chunk = []
-    if chunk:
+    # islice pulls the rows of a chunk in a C loop instead of appending
+    # them one by one in Python
+    it = iter(csvfile)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
         yield chunk
 
 
+def skip_binary_header(f, encoding):
+    """Read the header line from the binary file `f`.
+
+    Returns False if the data lines that follow cannot be split by their
+    raw bytes: encodings that are not ASCII compatible and files that
+    don't use LF or CRLF line endings.
+    """
+    if u'\n'.encode(encoding) != b'\n':
+        return False
+    header = f.readline()
+    return header.endswith(b'\n') and b'\r' not in header[:-2]
+
+
+def fast_ranges(dataset, encoding, range_size):
+    """Split the data lines of `dataset` into byte ranges of about
+    `range_size` bytes that start and end on line boundaries.
+
+    Returns a list of ``(start, end)`` offsets, or None if the dataset
+    is gzipped or cannot be split by its raw bytes, see
+    `skip_binary_header`.
+    """
+    if dataset.endswith('.gz'):
+        return None
+    size = os.path.getsize(dataset)
+    ranges = []
+    with open(dataset, 'rb') as f:
+        if not skip_binary_header(f, encoding):
+            return None
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + range_size, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def map_dataset(f):
+    """Map the open binary file `f` read-only into memory. """
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, 'madvise'):  # Python 3.8+
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return closing(mapped)
+
+
+def decode_fast_range(data, encoding):
+    """Turn the raw bytes `data` of a byte range into a ``FastChunk``.
+
+    Line endings are translated and the data is decoded the same way as
+    when the file is read in text mode.
+    """
+    if b'\r' in data:
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    text = data.decode(encoding)
+    if codecs.lookup(encoding).name not in ('utf-8', 'ascii'):
+        data = text.encode('utf-8')
+    return FastChunk.from_buffer(data)
+
+
+def rechunk(pieces, chunk_size):
+    """Regroup the ``FastChunk`` s `pieces` into chunks of `chunk_size`
+    rows. Only the last chunk may be shorter.
+    """
+    #  the rows left over from previous pieces, joined once a chunk is full
+    carry = []
+    n_carried = 0
+    for piece in pieces:
+        if n_carried:
+            need = chunk_size - n_carried
+            head, piece = piece[:need], piece[need:]
+            carry.append(head)
+            n_carried += len(head)
+            if n_carried < chunk_size:
+                continue
+            yield FastChunk.concat(carry)
+        n_full = len(piece) - len(piece) % chunk_size
+        for i in range(0, n_full, chunk_size):
+            yield piece[i:i + chunk_size]
+        carry = [piece[n_full:]]
+        n_carried = len(carry[0])
+    if n_carried:
+        yield FastChunk.concat(carry)
+
+
+def iter_mapped_chunks(dataset, encoding, ranges, chunk_size):
+    """Split `ranges` of the memory mapped `dataset` into ``FastChunk`` s
+    of `chunk_size` rows, in file order.
+    """
+    with open(dataset, 'rb') as f:
+        with map_dataset(f) as mapped:
+            pieces = (decode_fast_range(mapped[start:end], encoding)
+                      for start, end in ranges)
+            for chunk in rechunk(pieces, chunk_size):
+                yield chunk
+
+
+def iter_binary_chunks(dataset, encoding, chunk_size):
+    """Read `dataset` as bytes and yield its data lines as ``FastChunk`` s
+    of `chunk_size` rows.
+
+    Returns None if its lines cannot be split by their raw bytes.
+    """
+    f = open_binary(dataset, parallel=True)
+    if not skip_binary_header(f, encoding):
+        f.close()
+        return None
+
+    def chunks():
+        with f:
+            pieces = (decode_fast_range(b''.join(lines), encoding)
+                      for lines in iter_chunks(f, chunk_size))
+            for chunk in rechunk(pieces, chunk_size):
+                yield chunk
+    return chunks()
+
+
 class BatchGenerator(object):
     """Class to chunk a large csv files into a stream
     of batches of size ``--n_samples``.
@@ -211,18 +551,31 @@ class BatchGenerator(object):
         self.n_skipped = 0
 
     def csv_input_file_reader(self):
-        filename = self.dataset
-        is_gz = filename.endswith('.gz')
-        opener, mode = (
-            (gzip.open, 'rt' if six.PY3 else 'rb') if is_gz
-            else (open, 'rU')
-        )
-
-        if six.PY3:
-            fd = opener(filename, mode, encoding=self.encoding)
-        else:
-            fd = opener(filename, mode)
-        return fd
+        f = open_binary(self.dataset, parallel=True)
+        return io.TextIOWrapper(f, encoding=self.encoding)
+
+    def iter_fast_chunks(self, reader):
+        """Yield the rows of `reader` as ``FastChunk`` s.
+
+        Uncompressed inputs are split into byte ranges of the memory
+        mapped file instead of being read line by line. Compressed inputs
+        are read as bytes, so lines are not decoded one at a time.
+        """
+        encoding = self.encoding
+        if codecs.lookup(encoding).name == 'utf-8-sig':
+            #  the byte order mark is skipped with the header line, the
+            #  data lines after it are plain UTF-8
+            encoding = 'utf-8'
+        ranges = fast_ranges(self.dataset, encoding, FAST_RANGE_SIZE)
+        if ranges is None:
+            chunks = iter_binary_chunks(self.dataset, encoding,
+                                        self.chunksize)
+            if chunks is None:
+                chunks = (FastChunk.from_lines(chunk)
+                          for chunk in iter_chunks(reader, self.chunksize))
+            return chunks
+        return iter_mapped_chunks(self.dataset, encoding, ranges,
+                                  self.chunksize)
 
     def __iter__(self):
         if self.fast_mode:
@@ -238,7 +591,11 @@ class BatchGenerator(object):
             t0 = time()
             last_report = time()
             rows_read = 0
-            for chunk in iter_chunks(reader, self.chunksize):
+            if self.fast_mode:
+                chunks = self.iter_fast_chunks(reader)
+            else:
+                chunks = reader.iter_chunks(self.chunksize)
+            for chunk in chunks:
                 has_content = True
                 n_rows = len(chunk)
                 self.n_read += 1
@@ -248,6 +605,7 @@ class BatchGenerator(object):
                 else:
                     self.n_skipped += 1
                 rows_read += n_rows
+                del chunk  # not needed while the next chunk is read
                 if time() - last_report > REPORT_INTERVAL:
                     yield
                     last_report = time()
@@ -286,6 +644,9 @@ class Shovel(object):
         csv.register_dialect('dataset_dialect', dialect)
         batch_generator = BatchGenerator(*args)
         batch = None
+        #  the last batch put on the queue without its data, reported on
+        #  errors; zero rows until the first batch is queued
+        queued = Batch(0, 0, [], [], 0)
         try:
             n = 0
             self.shovel_status.value = b"R"
@@ -305,6 +666,9 @@ class Shovel(object):
                                 break
                             continue
                     n += 1
+                    #  don't keep the data alive while the next batch is read
+                    queued = batch._replace(data=[])
+                    batch = None
                 if self.abort_flag.value:
                     _ui.info('shoveling abort requested')
                     self.exit_fast(None, None)
@@ -337,7 +701,7 @@ class Shovel(object):
             self.progress_queue.put((
                 ProgressQueueMsg.SHOVEL_CSV_ERROR,
                 {
-                    "batch": batch and batch._replace(data=[]) or [],
+                    "batch": queued,
                     "error": str(e),
                     "produced": n,
                     "read": batch_generator.n_read,
@@ -351,7 +715,7 @@ class Shovel(object):
             self.progress_queue.put((
                 ProgressQueueMsg.SHOVEL_ERROR,
                 {
-                    "batch": batch and batch._replace("data", []) or [],
+                    "batch": queued,
                     "error": str(e),
                     "produced": n,
                     "read": batch_generator.n_read,
@@ -383,27 +747,67 @@ class Shovel(object):
             self.p.terminate()
 
 
+def guess_delimiter(sample):
+    """Find the delimiter of the decoded `sample` by counting the
+    ``DELIMITER_CANDIDATES`` on each of its complete lines.
+
+    A candidate is picked when it is the only one found in the header
+    the same number of times as on every other line. Returns None when
+    that is ambiguous or the sample contains quotes, which could hide
+    delimiters, otherwise ``(delimiter, skipinitialspace)``.
+    """
+    if '"' in sample or "'" in sample:
+        return None
+    newline = '\n' if '\n' in sample else '\r'
+    lines = sample.split(newline)[:-1]
+    if len(lines) < 2:
+        return None
+    header = lines[0]
+    found = [c for c in DELIMITER_CANDIDATES
+             if c in header and
+             len(set(map(str.count, lines, repeat(c)))) == 1]
+    if len(found) != 1:
+        return None
+    delimiter = found[0]
+    return delimiter, header.count(delimiter) == header.count(delimiter + ' ')
+
+
 def sniff_dialect(sample, encoding, sep, skip_dialect, ui):
     t1 = time()
     try:
         if skip_dialect:
             ui.debug('investigate_encoding_and_dialect - skip dialect detect')
             if sep:
+                #  a space after every delimiter of the header is skipped,
+                #  as the sniffer would
+                header = sample[:1000].decode(encoding, 'ignore')
+                header = header.partition('\n')[0]
+                skipinitialspace = (sep in header and header.count(sep) ==
+                                    header.count(sep + ' '))
                 csv.register_dialect('dataset_dialect', csv.excel,
-                                     delimiter=sep)
+                                     delimiter=sep,
+                                     skipinitialspace=skipinitialspace)
             else:
                 csv.register_dialect('dataset_dialect', csv.excel)
             dialect = csv.get_dialect('dataset_dialect')
         else:
-            sniffer = csv.Sniffer()
-            dialect = sniffer.sniff(sample.decode(encoding), delimiters=sep)
+            decoded = sample.decode(encoding)
+            guessed = None if sep else guess_delimiter(decoded)
+            if guessed:
+                delimiter, skipinitialspace = guessed
+                csv.register_dialect('dataset_dialect', csv.excel,
+                                     delimiter=delimiter,
+                                     skipinitialspace=skipinitialspace)
+                dialect = csv.get_dialect('dataset_dialect')
+            else:
+                sniffer = csv.Sniffer()
+                dialect = sniffer.sniff(decoded, delimiters=sep)
             ui.debug('investigate_encoding_and_dialect - seconds to detect '
                      'csv dialect: {}'.format(time() - t1))
     except csv.Error:
-        decoded_one = sample.decode(encoding)
         t2 = time()
         detector = Detector()
-        delimiter, resampled = detector.detect(decoded_one)
+        delimiter, resampled = detector.detect(decoded)
 
         if len(delimiter) == 1:
             delimiter = delimiter[0]
@@ -436,7 +840,10 @@ def investigate_encoding_and_dialect(dataset, sep, ui, fast=False,
                                      encoding=None, skip_dialect=False,
                                      output_delimiter=None):
     """Try to identify encoding and dialect.
-    Providing a delimiter may help with smaller datasets.
+    Providing a delimiter that appears in the header skips the dialect
+    detection of samples without single quotes, the excel dialect with
+    that delimiter is used instead. Like the sniffer, it skips the spaces
+    after the delimiter if every delimiter of the header is followed by one.
     Running this is costly so run it once per dataset."""
     t0 = time()
     if fast:
@@ -444,24 +851,27 @@ def investigate_encoding_and_dialect(dataset, sep, ui, fast=False,
     else:
         sample_size = DETECT_SAMPLE_SIZE_SLOW
 
-    is_gz = dataset.endswith('.gz')
-    opener, mode = (
-        (gzip.open, 'rb') if is_gz
-        else (open, ('rU' if six.PY2 else 'rb'))
-    )
-    with opener(dataset, mode) as dfile:
+    with open_binary(dataset) as dfile:
         sample = dfile.read(sample_size)
 
     if not encoding:
-        chardet_result = chardet.detect(sample)
+        encoding = detect_encoding(sample)
         ui.debug('investigate_encoding_and_dialect - seconds to detect '
                  'encoding: {}'.format(time() - t0))
-        encoding = chardet_result['encoding'].lower()
     else:
         ui.debug('investigate_encoding_and_dialect - skip encoding detect')
         encoding = encoding.lower()
         sample[:1000].decode(encoding)  # Fail here if the encoding is invalid
 
+    if sep and not skip_dialect:
+        #  the delimiter is known so there is no need to sniff the dialect,
+        #  unless the delimiter doesn't even show up in the header or the
+        #  sample may be quoted with single quotes, which only the sniffer
+        #  detects
+        decoded = sample.decode(encoding, 'ignore')
+        header = decoded[:1000].partition('\n')[0]
+        skip_dialect = sep in header and "'" not in decoded
+
     try:
         dialect = sniff_dialect(sample, encoding, sep, skip_dialect, ui)
     except csv.Error as ex:
@@ -482,13 +892,6 @@ def investigate_encoding_and_dialect(dataset, sep, ui, fast=False,
                      """--delimiter=','""")
         raise
 
-    #  in Python 2, csv.dialect sometimes returns unicode which the
-    #  PY2 csv.reader cannot handle. This may be from the Recoder
-    if six.PY2:
-        for a in ['delimiter', 'lineterminator', 'quotechar']:
-            if isinstance(getattr(dialect, a, None), type(u'')):
-                recast = str(getattr(dialect, a))
-                setattr(dialect, a, recast)
     csv.register_dialect('dataset_dialect', dialect)
     #  the csv writer should use the systems newline char
     csv.register_dialect('writer_dialect', dialect,
@@ -507,76 +910,73 @@ def investigate_encoding_and_dialect(dataset, sep, ui, fast=False,
     return encoding
 
 
-def auto_sampler(dataset, encoding, ui):
+def auto_sampler(dataset, encoding, ui, fast=False):
     """
     Automatically find an appropriate number of rows to send per batch based
     on the average row size.
+    In fast mode every line is a record, so the sample is not parsed.
     :return:
     """
 
     t0 = time()
 
     sample_size = AUTO_SAMPLE_SIZE
-    is_gz = dataset.endswith('.gz')
-    opener, mode = (gzip.open, 'rb') if is_gz else (open, 'rU')
-    with opener(dataset, mode) as dfile:
+    encoding = encoding or 'utf-8'
+    with open_binary(dataset) as dfile:
         sample = dfile.read(sample_size)
-        if six.PY3 and not is_gz:
-            sample = sample.encode(encoding or 'utf-8')
-
-    ingestable_sample = sample.decode(encoding)
-    size_bytes = sys.getsizeof(ingestable_sample.encode('utf-8'))
 
-    if size_bytes < (sample_size * 0.75):
+    if len(sample) < (sample_size * 0.75):
         #  if dataset is tiny, don't bother auto sampling.
         ui.info('auto_sampler: total time seconds - {}'.format(time() - t0))
         ui.info('auto_sampler: defaulting to {} samples for small dataset'
                 .format(AUTO_SMALL_SAMPLES))
         return AUTO_SMALL_SAMPLES
 
-    if six.PY3:
-        buf = io.StringIO()
-        buf.write(ingestable_sample)
-    else:
-        buf = StringIO.StringIO()
-        buf.write(sample)
-    buf.seek(0)
-    file_lines, csv_lines = 0, 0
-    dialect = csv.get_dialect('dataset_dialect')
-    fd = Recoder(buf, encoding)
-    reader = csv.reader(fd, dialect=dialect, delimiter=dialect.delimiter)
-    line_pos = []
-    for _ in buf:
-        file_lines += 1
-        line_pos.append(buf.tell())
+    if codecs.lookup(encoding).name not in ('utf-8', 'ascii'):
+        #  batches are posted in UTF-8, so measure lines in UTF-8. This also
+        #  makes lines of e.g. UTF-16 input searchable in the raw bytes.
+        sample = sample.decode(encoding, 'ignore').encode('utf-8')
+        encoding = 'utf-8'
+
+    size_bytes = len(sample)
+
+    newline = b'\n'
+    if newline not in sample and b'\r' in sample:
+        newline = b'\r'
 
     #  remove the last line since it's probably not fully formed
-    try:
-        buf.truncate(line_pos[-2])
-        buf.seek(0)
-        file_lines -= 1
-    except IndexError:
+    end = sample.rfind(newline, 0, len(sample) - 1) + 1
+    if not end:
         # PRED-1240 there's no guarantee that we got _any_ fully formed lines.
         # If so, the dataset is super wide, so we only send 10 rows at a time
         return AUTO_SAMPLE_FALLBACK
+    file_lines = sample.count(newline, 0, end)
 
-    try:
-        for _ in reader:
-            csv_lines += 1
-    except csv.Error:
-        if buf.tell() in line_pos[-3:]:
-            ui.debug('auto_sampler: caught csv.Error at end of sample. '
-                     'seek_position: {}, csv_line: {}'.format(buf.tell(),
-                                                              line_pos))
-        else:
-            ui.fatal('--auto_sample failed to parse the csv file. Try again '
-                     'without --auto_sample. seek_position: {}, '
-                     'csv_line: {}'.format(buf.tell(), line_pos))
-            raise
+    if fast:
+        csv_lines = file_lines
     else:
-        ui.debug('auto_sampler: analyzed {} csv rows'.format(csv_lines))
+        lines = sample[:end - 1].decode(encoding)
+        newline = newline.decode('ascii')
+        dialect = csv.get_dialect('dataset_dialect')
+        reader = csv.reader(lines.split(newline), dialect=dialect,
+                            delimiter=dialect.delimiter)
+        csv_lines = 0
+        try:
+            for _ in reader:
+                csv_lines += 1
+        except csv.Error:
+            if reader.line_num >= file_lines - 2:
+                ui.debug('auto_sampler: caught csv.Error at end of sample. '
+                         'line: {}, lines: {}'.format(reader.line_num,
+                                                      file_lines))
+            else:
+                ui.fatal('--auto_sample failed to parse the csv file. Try '
+                         'again without --auto_sample. line: {}, '
+                         'lines: {}'.format(reader.line_num, file_lines))
+                raise
+        else:
+            ui.debug('auto_sampler: analyzed {} csv rows'.format(csv_lines))
 
-    buf.close()
     avg_line = int(size_bytes / csv_lines)
     chunk_size_goal = AUTO_GOAL_SIZE  # size we want per batch
     lines_per_sample = int(chunk_size_goal / avg_line) + 1
@@ -5,21 +5,15 @@ import logging
 import os
 import sys
 from collections import namedtuple
+from configparser import ConfigParser
 from functools import partial
 from gzip import GzipFile
 from os import getcwd
 from os.path import expanduser, isfile, join as path_join
+from urllib.parse import urlparse
 
 import requests
-import six
 import trafaret as t
-from six.moves.configparser import ConfigParser
-from six.moves import input
-
-if six.PY2:
-    from urlparse import urlparse
-elif six.PY3:
-    from urllib.parse import urlparse
 
 OptKey = partial(t.Key, optional=True)
 
@@ -1,29 +1,23 @@
 import csv
+import dbm.dumb as dumb_dbm
 import glob
 import hashlib
 import multiprocessing
 import operator
 import os
+import queue
 import shelve
 import signal
 import sys
 from functools import reduce
 from time import time
 
-import six
-from six.moves import queue
-
 from datarobot_batch_scoring.consts import SENTINEL, \
     WriterQueueMsg, ProgressQueueMsg, REPORT_INTERVAL
 from datarobot_batch_scoring.utils import get_rusage
 from datarobot_batch_scoring.exceptions import ShelveError, \
     UnexpectedKeptColumnCount, NoPredictionThresholdInResult
 
-if six.PY3:
-    import dbm.dumb as dumb_dbm
-else:
-    import dumbdbm as dumb_dbm
-
 
 class RunContext(object):
     """A context for a run backed by a persistant store.
@@ -164,10 +158,7 @@ class RunContext(object):
         self.dialect = csv.get_dialect('dataset_dialect')
         self.writer_dialect = csv.get_dialect('writer_dialect')
         self.db = shelve.open(self.file_context.file_name, writeback=True)
-        if six.PY2:
-            self.out_stream = open(self.out_file, 'ab')
-        elif six.PY3:
-            self.out_stream = open(self.out_file, 'a', newline='')
+        self.out_stream = open(self.out_file, 'a', newline='')
 
     def close(self):
         if not self.is_open:
@@ -245,10 +236,7 @@ class NewRunContext(RunContext):
         # used to check if output file is dirty (ie first write op)
         self.db['first_write'] = True
         self.db.sync()
-        if six.PY2:
-            self.out_stream = open(self.out_file, 'w+b')
-        elif six.PY3:
-            self.out_stream = open(self.out_file, 'w+', newline='')
+        self.out_stream = open(self.out_file, 'w+', newline='')
         return self
 
     def __exit__(self, type, value, traceback):
@@ -304,10 +292,7 @@ class OldRunContext(RunContext):
                                     self.db['output_delimiter'],
                                     self.output_delimiter))
 
-        if six.PY2:
-            self.out_stream = open(self.out_file, 'ab')
-        elif six.PY3:
-            self.out_stream = open(self.out_file, 'a', newline='')
+        self.out_stream = open(self.out_file, 'a', newline='')
 
         self._ui.info('resuming a shelved run with {} checkpointed batches'
                       .format(len(self.db['checkpoints'])))
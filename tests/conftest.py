@@ -1,8 +1,8 @@
+import io
 import os
 import tempfile
 import uuid
 import pytest
-import six
 
 from datarobot_batch_scoring.utils import UI
 from datarobot_batch_scoring.writer import ContextFile
@@ -26,13 +26,13 @@ def ui():
 
 @pytest.fixture
 def csv_file_handle_with_wide_field():
-    stream = six.StringIO()
+    stream = io.StringIO()
     stream.write('idx,data\n')
     stream.write('1,one\n')
     stream.write('2,two\n')
     stream.write('3,three\n')
     stream.write('4,')
-    for idx in six.moves.range(50000):
+    for idx in range(50000):
         stream.write('spam{}'.format(idx))
     stream.seek(0)
     return stream
@@ -43,7 +43,7 @@ def csv_data_with_wide_dataset():
     """Data of a very wide dataset, whose first line does not fit within
     the threshold for the auto_sampler
     """
-    stream = six.StringIO()
+    stream = io.StringIO()
     # write header
     for i in range(1024 * 128):
         stream.write('column_{:0>8},'.format(i))
@@ -57,7 +57,7 @@ def csv_data_with_wide_dataset():
 
 def csv_data_with_term(term):
     """ Data where each line is terminated by term """
-    stream = six.StringIO()
+    stream = io.StringIO()
     data = [
         'idx,data',
         '1,one',
@@ -1,4 +1,9 @@
+import csv
+import os
+import tempfile
+
 import mock
+import pytest
 
 from datarobot_batch_scoring.reader import (investigate_encoding_and_dialect,
                                             auto_sampler)
@@ -21,3 +26,26 @@ class TestAutoSampler(object):
                          encoding=enc,
                          ui=mock.Mock())
         assert 10 == s
+
+    @pytest.mark.parametrize('fast', [True, False])
+    @pytest.mark.parametrize('encoding, newline', [
+        ('utf-16', '\n'),
+        ('latin-1', '\n'),
+        ('utf-8', '\r'),
+    ])
+    def test_line_size_independent_of_encoding(self, encoding, newline,
+                                               fast):
+        csv.register_dialect('dataset_dialect', csv.excel)
+        lines = ['a,b,c'] + [u'{0},\xe9,{0}'.format(i % 10)
+                             for i in range(100000)]
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            f.write('\n'.join(lines).encode('utf-8'))
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as g:
+            g.write(newline.join(lines).encode(encoding))
+        try:
+            expected = auto_sampler(f.name, 'utf-8', mock.Mock(), fast=fast)
+            assert auto_sampler(g.name, encoding, mock.Mock(),
+                                fast=fast) == expected
+        finally:
+            os.remove(f.name)
+            os.remove(g.name)
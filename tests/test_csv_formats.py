@@ -335,7 +335,7 @@ def test_quotechar_in_keep_cols(live_server):
         assert ret is None
 
         last_line = open("out.csv", "rb").readlines()[-1]
-        expected_last_line = b'1044,2,"eeeeeeee ""eeeeee"" eeeeeeeeeeee'
+        expected_last_line = b'261,2,"eeeeeeee ""eeeeee"" eeeeeeeeeeee'
         assert last_line[:len(expected_last_line)] == expected_last_line
 
 
@@ -1,9 +1,29 @@
+# -*- coding: utf-8 -*-
 import csv
+import gzip
+import io
+import os
+import pickle
+import tempfile
 
+import mock
 import pytest
 from mock import Mock
 
-from datarobot_batch_scoring.reader import FastReader, SlowReader
+from datarobot_batch_scoring.consts import Batch, ProgressQueueMsg
+from datarobot_batch_scoring.reader import (BatchGenerator, FastChunk,
+                                            FastReader, Shovel, SlowReader,
+                                            build_row_parser, fast_ranges,
+                                            fast_to_csv_chunk,
+                                            iter_binary_chunks,
+                                            iter_mapped_chunks,
+                                            line_offsets, open_binary,
+                                            rechunk)
+
+
+@pytest.fixture
+def registered_dialect():
+    csv.register_dialect('dataset_dialect', csv.excel)
 
 
 class TestCSVReaderWithWideData(object):
@@ -98,6 +118,50 @@ class TestCSVDataReaderWithTerminators(object):
         assert len(data) == 3
 
 
+@pytest.mark.usefixtures('registered_dialect')
+class TestFastReaderMultiline(object):
+
+    def test_single_line_records(self, csv_data_with_lf):
+        ui = Mock()
+        reader = FastReader(csv_data_with_lf, 'utf-8', ui=ui)
+        assert reader.fieldnames == ['idx', 'data']
+        assert list(reader) == ['1,one\n', '2,two\n', '3,three\n']
+        assert not ui.fatal.called
+
+    def test_multiline_records(self):
+        ui = Mock()
+        data = io.StringIO('idx,data\n1,"one\nuno"\n2,two\n')
+        FastReader(data, 'utf-8', ui=ui)
+        assert ui.fatal.called
+
+    @pytest.mark.parametrize('start, multiline', [(99, True), (100, True),
+                                                  (101, False)])
+    def test_multiline_record_at_peek_boundary(self, start, multiline):
+        ui = Mock()
+        lines = ['idx,data\n'] + ['{},x\n'.format(i) for i in range(200)]
+        lines[start - 1] = '{},"multi\nline"\n'.format(start)
+        FastReader(io.StringIO(''.join(lines)), 'utf-8', ui=ui)
+        assert ui.fatal.called == multiline
+
+    def test_quoted_single_line_records(self):
+        ui = Mock()
+        data = io.StringIO('idx,data\n1,"one, uno"\n2,"two"\n')
+        FastReader(data, 'utf-8', ui=ui)
+        assert not ui.fatal.called
+
+    def test_escaped_newline(self):
+        csv.register_dialect('dataset_dialect', csv.excel, escapechar='\\')
+        ui = Mock()
+        data = io.StringIO('idx,data\n1,one\\\nuno\n2,two\n')
+        FastReader(data, 'utf-8', ui=ui)
+        assert ui.fatal.called
+
+    def test_does_not_seek(self, csv_data_with_lf):
+        lines = iter(csv_data_with_lf.getvalue().splitlines(True))
+        reader = FastReader(lines, 'utf-8', ui=Mock(), peek_size=2)
+        assert list(reader) == ['1,one\n', '2,two\n', '3,three\n']
+
+
 class TestCSVFileReaderWithTerminators(object):
     """
     Class of tests to handle files with terninators
@@ -145,3 +209,277 @@ class TestCSVFileReaderWithTerminators(object):
             reader = SlowReader(handle, 'utf-8', ui=Mock())
             data = list(reader)
             assert len(data) == 3
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+@pytest.mark.parametrize('use_rapidgzip', [True, False])
+def test_open_binary_gzip(use_rapidgzip, parallel):
+    dataset = 'tests/fixtures/temperatura_predict.csv.gz'
+    with gzip.open(dataset, 'rb') as f:
+        expected = f.read()
+    if use_rapidgzip:
+        pytest.importorskip('rapidgzip')
+        with open_binary(dataset, parallel) as f:
+            assert f.read() == expected
+    else:
+        with mock.patch('datarobot_batch_scoring.reader.rapidgzip', None):
+            with open_binary(dataset, parallel) as f:
+                assert f.read() == expected
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_open_binary_gzip_parallel_only_for_full_reads(parallel):
+    dataset = 'tests/fixtures/temperatura_predict.csv.gz'
+    with mock.patch('datarobot_batch_scoring.reader.rapidgzip') as rg:
+        rg.RapidgzipFile.side_effect = lambda name, **kw: gzip.open(name)
+        with open_binary(dataset, parallel) as f:
+            assert f.read(4) == b',x\n0'
+    assert rg.RapidgzipFile.called == parallel
+
+
+@pytest.mark.usefixtures('registered_dialect')
+def test_batch_generator_reads_gzip_in_parallel():
+    with mock.patch('datarobot_batch_scoring.reader.open_binary',
+                    wraps=open_binary) as ob:
+        batches = BatchGenerator('tests/fixtures/temperatura_predict.csv.gz',
+                                 10, 1, ',', Mock(), True, 'utf-8')
+        assert next(iter(batches)).rows == 10
+    assert ob.call_args_list
+    assert all(call[1] == {'parallel': True} for call in ob.call_args_list)
+
+
+class TestFastChunk(object):
+
+    lines = ['1,one\n', '2,zwei\n', '3,três\n']
+
+    def test_from_lines(self):
+        chunk = FastChunk.from_lines(self.lines)
+        assert len(chunk) == 3
+        assert list(chunk) == self.lines
+        assert chunk[-1] == self.lines[-1]
+        assert chunk.data == ''.join(self.lines).encode('utf-8')
+
+    def test_slicing(self):
+        chunk = FastChunk.from_lines(self.lines)
+        head, tail = chunk[:1], chunk[1:]
+        assert list(head) == self.lines[:1]
+        assert list(tail) == self.lines[1:]
+        assert tail[1] == self.lines[2]
+        assert list(tail[1:]) == self.lines[2:]
+        assert len(chunk[3:]) == 0
+        with pytest.raises(IndexError):
+            tail[2]
+
+    def test_pickle(self):
+        chunk = FastChunk.from_lines(self.lines)[1:]
+        unpickled = pickle.loads(pickle.dumps(chunk, 2))
+        assert isinstance(unpickled.data, bytes)
+        assert list(unpickled) == self.lines[1:]
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    @pytest.mark.parametrize('data', [b'', b'1,one\n', b'1,one\n\n2,two',
+                                      u'1,one\n2,zwei\n3,tr\xeas\n'
+                                      .encode('utf-8')])
+    def test_from_buffer(self, data, use_numpy):
+        if use_numpy:
+            pytest.importorskip('numpy')
+            chunk = FastChunk.from_buffer(data)
+        else:
+            with mock.patch('datarobot_batch_scoring.reader.numpy', None):
+                chunk = FastChunk.from_buffer(data)
+        assert list(chunk) == data.decode('utf-8').splitlines(True)
+        assert line_offsets(data)[-1] == len(data)
+
+    def test_concat(self):
+        chunk = FastChunk.from_lines(self.lines * 2)
+        joined = FastChunk.concat([chunk[1:2], chunk[2:2], chunk[2:5]])
+        assert list(joined) == (self.lines * 2)[1:5]
+        assert joined.offsets[0] == 0
+
+    def test_rechunk_small_pieces(self):
+        lines = ['{}\n'.format(i) for i in range(50)]
+        pieces = [FastChunk.from_lines(lines[i:i + 3])
+                  for i in range(0, 50, 3)]
+        chunks = list(rechunk(pieces, 20))
+        assert [len(c) for c in chunks] == [20, 20, 10]
+        assert [line for c in chunks for line in c] == lines
+
+    def test_fast_to_csv_chunk(self):
+        chunk = FastChunk.from_lines(self.lines)[1:]
+        expected = 'idx,data\n' + ''.join(self.lines[1:])
+        assert fast_to_csv_chunk(chunk, ['idx', 'data']) == \
+            expected.encode('utf-8')
+
+
+@pytest.mark.usefixtures('registered_dialect')
+class TestFastChunkPaths(object):
+
+    @pytest.yield_fixture
+    def dataset(self):
+        lines = [u'idx,data'] + [u'{},d\xe9j\xe0 {}'.format(i, 'x' * (i % 7))
+                                 for i in range(1000)]
+        lines[500] = u''
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            f.write(u'\r\n'.join(lines).encode('latin-1'))
+        yield f.name
+        os.remove(f.name)
+
+    def batches(self, dataset):
+        batches = BatchGenerator(dataset, 30, 1, ',', Mock(), True,
+                                 'latin-1')
+        return [(b.id, b.rows, list(b.data)) for b in batches if b]
+
+    def line_batches(self, dataset):
+        with mock.patch('datarobot_batch_scoring.reader.fast_ranges',
+                        return_value=None):
+            return self.batches(dataset)
+
+    def test_mapped_same_batches_as_serial(self, dataset):
+        expected = self.line_batches(dataset)
+        with mock.patch('datarobot_batch_scoring.reader.FAST_RANGE_SIZE',
+                        1000):
+            with mock.patch('datarobot_batch_scoring.reader.'
+                            'iter_mapped_chunks',
+                            wraps=iter_mapped_chunks) as mapped:
+                assert self.batches(dataset) == expected
+        assert mapped.called
+
+    def test_gzip_same_batches_as_serial(self, dataset):
+        expected = self.line_batches(dataset)
+        with open(dataset, 'rb') as f, gzip.open(dataset + '.gz', 'wb') as gz:
+            gz.write(f.read())
+        try:
+            with mock.patch('datarobot_batch_scoring.reader.'
+                            'iter_binary_chunks',
+                            wraps=iter_binary_chunks) as binary:
+                assert self.batches(dataset + '.gz') == expected
+            assert binary.called
+        finally:
+            os.remove(dataset + '.gz')
+
+    def test_utf8_bom_is_mapped(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            f.write(u'idx,data\n1,d\xe9j\xe0\n2,x\n'.encode('utf-8-sig'))
+        try:
+            with mock.patch('datarobot_batch_scoring.reader.'
+                            'iter_mapped_chunks',
+                            wraps=iter_mapped_chunks) as mapped:
+                batches = list(BatchGenerator(f.name, 30, 1, ',', Mock(),
+                                              True, 'utf-8-sig'))
+            assert mapped.called
+            assert batches[0].fieldnames == ['idx', 'data']
+            assert list(batches[0].data) == [u'1,d\xe9j\xe0\n', u'2,x\n']
+        finally:
+            os.remove(f.name)
+
+    def test_fast_ranges_align_to_lines(self, dataset):
+        ranges = fast_ranges(dataset, 'latin-1', 1000)
+        with open(dataset, 'rb') as f:
+            data = f.read()
+        assert ranges[0][0] == data.index(b'\n') + 1
+        assert ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert data[end - 1:end] == b'\n'
+
+    def test_fast_ranges_not_for_gzip(self):
+        assert fast_ranges('tests/fixtures/temperatura_predict.csv.gz',
+                           'utf-8', 1000) is None
+
+
+@pytest.mark.usefixtures('registered_dialect')
+class TestSlowReaderChunks(object):
+
+    def test_empty_rows_are_dropped(self):
+        ui = Mock()
+        data = io.StringIO('idx,data\n1,a\n\n2,b\n3,c\n\n\n4,d\n5,e\n')
+        reader = SlowReader(data, 'utf-8', ui=ui)
+        chunks = list(reader.iter_chunks(2))
+        assert chunks == [[['1', 'a'], ['2', 'b']],
+                          [['3', 'c'], ['4', 'd']],
+                          [['5', 'e']]]
+        assert ui.warning.call_count == 1
+
+    def test_exact_chunks(self, csv_data_with_lf):
+        reader = SlowReader(csv_data_with_lf, 'utf-8', ui=Mock())
+        assert list(reader.iter_chunks(3)) == [
+            [['1', 'one'], ['2', 'two'], ['3', 'three']]]
+
+    def test_quoted_rows_match_csv_reader(self):
+        data = ('idx,data\n1,a\n2,"b,c"\n3,"multi\nline"\n4,d\n5,e\n'
+                '6,"x\n\ny"\n7,f\n')
+        expected = list(csv.reader(io.StringIO(data)))[1:]
+        for chunk_size in (1, 2, 3, 4, 10):
+            reader = SlowReader(io.StringIO(data), 'utf-8', ui=Mock())
+            chunks = list(reader.iter_chunks(chunk_size))
+            assert [len(c) for c in chunks[:-1]] == \
+                [chunk_size] * (len(chunks) - 1)
+            assert [row for c in chunks for row in c] == expected
+
+    def test_no_row_parser_for_skipinitialspace(self):
+        assert build_row_parser(csv.excel) is not None
+        csv.register_dialect('dataset_dialect', csv.excel,
+                             skipinitialspace=True)
+        assert build_row_parser(csv.get_dialect('dataset_dialect')) is None
+
+
+@pytest.mark.usefixtures('registered_dialect')
+def test_nul_is_left_to_csv_reader():
+    data = 'idx,data\n1,a\x00b\n'
+    csv_reader = csv.reader
+    readers = []
+
+    def reader(lines, *args, **kwargs):
+        # drops the NUL that csv.reader rejects before Python 3.11, so the
+        # rows show whether the line went through it
+        readers.append(csv_reader((line.replace('\0', '') for line in lines),
+                                  *args, **kwargs))
+        return readers[-1]
+
+    with mock.patch('datarobot_batch_scoring.reader.csv.reader',
+                    side_effect=reader):
+        FastReader(io.StringIO(data), 'utf-8', ui=Mock())
+        assert readers[-1].line_num == 2  # parsed past the header
+        slow = SlowReader(io.StringIO(data), 'utf-8', ui=Mock())
+        assert list(slow.iter_chunks(10)) == [[['1', 'ab']]]
+
+
+def shove(batches, error):
+    ui = Mock()
+    progress_queue = Mock()
+    shovel = Shovel(Mock(), progress_queue, Mock(), Mock(value=False),
+                    None, ui)
+    dialect = Mock(to_dialect=Mock(return_value=csv.excel))
+    args = [None, None, None, None, ui]
+    batch_generator = mock.MagicMock(n_read=1, n_skipped=0)
+    batch_generator.__iter__.return_value = batches()
+    with mock.patch('datarobot_batch_scoring.reader.BatchGenerator',
+                    return_value=batch_generator), \
+            mock.patch('datarobot_batch_scoring.reader.signal.signal'):
+        with pytest.raises(error):
+            shovel._shove(args, dialect, Mock())
+    return progress_queue.put.call_args[0][0]
+
+
+def test_shovel_error_reports_last_queued_batch():
+    def batches():
+        yield Batch(0, 2, ['a'], [['1'], ['2']], 3)
+        yield
+        raise ValueError('broken')
+
+    msg, info = shove(batches, ValueError)
+    assert msg == ProgressQueueMsg.SHOVEL_ERROR
+    assert info['batch'] == Batch(0, 2, ['a'], [], 3)
+    assert info['error'] == 'broken'
+
+
+def test_shovel_csv_error_before_first_batch():
+    def batches():
+        raise csv.Error('broken')
+        yield
+
+    msg, info = shove(batches, csv.Error)
+    assert msg == ProgressQueueMsg.SHOVEL_CSV_ERROR
+    batch = info['batch']
+    assert batch.id + batch.rows == 0
+    assert batch.data == []
@@ -9,7 +9,8 @@ from datarobot_batch_scoring.utils import (verify_objectid, UI,
                                            SerializableDialect)
 from datarobot_batch_scoring.reader import (iter_chunks,
                                             investigate_encoding_and_dialect,
-                                            auto_sampler)
+                                            auto_sampler, detect_encoding,
+                                            guess_delimiter)
 from utils import PickableMock
 
 
@@ -21,33 +22,33 @@ def test_invalid_objectid():
 class TestUi(object):
     def test_prompt_yesno_always_yes(self):
         with UI(True, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 assert ui.prompt_yesno('msg')
                 assert not m_input.called
 
     def test_prompt_yesno_always_no(self):
         with UI(False, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 assert not ui.prompt_yesno('msg')
                 assert not m_input.called
 
     def test_prompt_yesno_user_input_yes(self):
         with UI(None, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 m_input.return_value = 'yEs'
                 assert ui.prompt_yesno('msg')
                 m_input.assert_called_with('msg (Yes/No)> ')
 
     def test_prompt_yesno_user_input_no(self):
         with UI(None, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 m_input.return_value = 'nO'
                 assert not ui.prompt_yesno('msg')
                 m_input.assert_called_with('msg (Yes/No)> ')
 
     def test_prompt_yesno_user_input_invalid(self):
         with UI(None, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 m_input.side_effect = ['invalid', 'yes']
                 assert ui.prompt_yesno('msg')
                 m_input.assert_has_calls([mock.call('msg (Yes/No)> '),
@@ -55,22 +56,21 @@ class TestUi(object):
 
     def test_prompt_yesno_user_input_y(self):
         with UI(None, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 m_input.return_value = 'y'
                 assert ui.prompt_yesno('msg')
                 m_input.assert_called_with('msg (Yes/No)> ')
 
     def test_prompt_yesno_user_input_n(self):
         with UI(None, logging.DEBUG, stdout=False) as ui:
-            with mock.patch('datarobot_batch_scoring.utils.input') as m_input:
+            with mock.patch('builtins.input') as m_input:
                 m_input.return_value = 'n'
                 assert not ui.prompt_yesno('msg')
                 m_input.assert_called_with('msg (Yes/No)> ')
 
     def test_prompt_user(self):
             with UI(None, logging.DEBUG, stdout=False) as ui:
-                with mock.patch('datarobot_batch_scoring.utils.input'
-                                '') as m_input:
+                with mock.patch('builtins.input') as m_input:
                     m_input.return_value = 'Andrew'
                     assert ui.prompt_user() == 'Andrew'
                     m_input.assert_called_with('user name> ')
@@ -175,6 +175,28 @@ def test_investigate_encoding_and_dialect():
         assert dialect.delimiter == ','
 
 
+@pytest.mark.parametrize('sample, expected', [
+    (b'\xef\xbb\xbfa,b\n1,2\n', 'utf-8-sig'),
+    (b'\xff\xfea\x00,\x00b\x00', 'utf-16'),
+    (b'\xfe\xff\x00a\x00,\x00b', 'utf-16'),
+    (b'\xff\xfe\x00\x00a\x00\x00\x00', 'utf-32'),
+    (b'a,b\n1,2\n', 'ascii'),
+])
+def test_detect_encoding_without_chardet(sample, expected):
+    with mock.patch('datarobot_batch_scoring.reader.chardet.detect') as cd:
+        assert detect_encoding(sample) == expected
+    assert not cd.called
+
+
+def test_detect_encoding_falls_back_to_chardet():
+    with open('tests/fixtures/windows_encoded.csv', 'rb') as f:
+        sample = f.read()
+    with mock.patch('datarobot_batch_scoring.reader.chardet.detect',
+                    return_value={'encoding': 'Windows-1252'}) as cd:
+        assert detect_encoding(sample) == 'windows-1252'
+    cd.assert_called_once_with(sample)
+
+
 def test_investigate_encoding_and_dialect_submit_encoding():
 
     with UI(None, logging.DEBUG, stdout=False) as ui:
@@ -218,6 +240,71 @@ def test_investigate_encoding_and_dialect_substitute_delimiter():
         assert dialect.delimiter == '|'
 
 
+def test_investigate_encoding_and_dialect_delimiter_skips_sniffing():
+
+    with UI(None, logging.DEBUG, stdout=False) as ui:
+        with mock.patch('datarobot_batch_scoring.reader.csv.Sniffer') as sn:
+            data = 'tests/fixtures/temperatura_predict_tab.csv'
+            investigate_encoding_and_dialect(data, '\t', ui,
+                                             fast=False,
+                                             encoding='',
+                                             skip_dialect=False)
+        assert not sn.called
+        dialect = csv.get_dialect('dataset_dialect')
+        assert dialect.delimiter == '\t'
+
+
+@pytest.mark.parametrize('sample, expected', [
+    ('a,b,c\r\n1,2,3\r\n4,5,6\r\n7,8', (',', False)),
+    ('a;b c;d\n1;2 3;4\n', (';', False)),
+    ('a, b\n1, 2\n3, 4\n', (',', True)),
+    ('a|b\r1|2\r', ('|', False)),
+    ('a,b;c\n1,2;3\n', None),  # ambiguous
+    ('a,b\n1,2,3\n', None),  # ragged
+    ('a,b\n"1,5",2\n', None),  # quoted
+    ('a,b\n1,2', None),  # no complete data line
+])
+def test_guess_delimiter(sample, expected):
+    assert guess_delimiter(sample) == expected
+
+
+def test_investigate_encoding_and_dialect_delimiter_single_quotes(tmpdir):
+    data = tmpdir.join('single_quotes.csv')
+    data.write('a,b,c\n' + "1,'x, y',2\n" * 20)
+    with UI(None, logging.DEBUG, stdout=False) as ui:
+        investigate_encoding_and_dialect(str(data), ',', ui)
+    dialect = csv.get_dialect('dataset_dialect')
+    assert dialect.quotechar == "'"
+    rows = list(csv.reader(["1,'x, y',2"], dialect))
+    assert rows == [['1', 'x, y', '2']]
+
+
+def test_investigate_encoding_and_dialect_delimiter_with_spaces(tmpdir):
+    data = tmpdir.join('spaces.csv')
+    data.write('a; b; c\n' + '1; x; 2\n' * 20)
+    with UI(None, logging.DEBUG, stdout=False) as ui:
+        with mock.patch('datarobot_batch_scoring.reader.csv.Sniffer') as sn:
+            investigate_encoding_and_dialect(str(data), ';', ui)
+    assert not sn.called
+    dialect = csv.get_dialect('dataset_dialect')
+    assert dialect.skipinitialspace
+    rows = list(csv.reader(['1; x; 2'], dialect))
+    assert rows == [['1', 'x', '2']]
+
+
+def test_investigate_encoding_and_dialect_counts_delimiter():
+
+    with UI(None, logging.DEBUG, stdout=False) as ui:
+        with mock.patch('datarobot_batch_scoring.reader.csv.Sniffer') as sn:
+            data = 'tests/fixtures/temperatura_predict_tab.csv'
+            investigate_encoding_and_dialect(data, None, ui)
+        assert not sn.called
+        dialect = csv.get_dialect('dataset_dialect')
+        assert dialect.delimiter == '\t'
+        assert dialect.quotechar == '"'
+        assert dialect.doublequote
+
+
 def test_stdout_logging_and_csv_module_fail(capsys):
     with UI(None, logging.DEBUG, stdout=True) as ui:
         data = 'tests/fixtures/unparsable.csv'
@@ -242,6 +329,15 @@ def test_auto_sample():
         ui.close()
 
 
+def test_auto_sample_fast():
+    with UI(None, logging.DEBUG, stdout=False) as ui:
+        data = 'tests/fixtures/criteo_top30_1m.csv.gz'
+        encoding = investigate_encoding_and_dialect(data, None, ui)
+        with mock.patch('datarobot_batch_scoring.reader.csv.reader') as rd:
+            assert auto_sampler(data, encoding, ui, fast=True) == 14980
+        assert not rd.called
+
+
 def test_auto_small_dataset():
     with UI(None, logging.DEBUG, stdout=False) as ui:
         data = 'tests/fixtures/regression_jp.csv.gz'